@@ -1,27 +1,37 @@
 import sys
 import os
+from tempfile import TemporaryDirectory
 from classes.CompilationEngine import CompilationEngine
+from classes.Diagnostics import CompilationError
+from classes.VMLinker import VMLinker
+from classes.SignatureIndex import SignatureIndex
 
-arg_length = len(sys.argv)
+# --link merges every compiled class into a single .vm bundle
+# --no-cache keeps the signature index from being saved to .jack_signatures.json in the source directory
+options = ['--link', '--no-cache']
+link_mode = '--link' in sys.argv[1:]
+use_signature_cache = '--no-cache' not in sys.argv[1:]
+args = [arg for arg in sys.argv[1:] if arg not in options]
 
-if arg_length < 2:
+if len(args) < 1:
     print('Missing the input file')
-    sys.exit()
-elif arg_length > 2:
+    sys.exit(1)
+elif len(args) > 1:
     print('Too many arguments')
-    sys.exit()
+    sys.exit(1)
 
-input_file = sys.argv[1]
+input_file = args[0]
 
 if os.path.isdir(input_file):
     # Find all .jack files in the given directory and create xml output file for each one 
 
     # return a list of full paths to input, output files for every .jack file 
+    # sorted, so link mode lays out statics and functions the same way on every filesystem
     jack_files = [
       {
         'input_file_path': os.path.join(input_file, f), 
         'output_file_path': os.path.join(input_file, f.replace('.jack', '.vm'))
-      } for f in os.listdir(input_file) if f.endswith('.jack')
+      } for f in sorted(os.listdir(input_file)) if f.endswith('.jack')
     ]
 
 elif os.path.isfile(input_file) and input_file.endswith('.jack'):
@@ -31,12 +41,80 @@ elif os.path.isfile(input_file) and input_file.endswith('.jack'):
     }]
 else:
     print('Input file has wrong file extension. Prove a file with .jack extension')
-    sys.exit()
+    sys.exit(1)
+
+def build_signature_index():
+  # Signatures of every class in the project directory, so calls to sibling classes are checked even when compiling a single file
+  project_dir = input_file if os.path.isdir(input_file) else os.path.dirname(input_file) or '.'
+  return SignatureIndex(
+    [os.path.join(project_dir, f) for f in sorted(os.listdir(project_dir)) if f.endswith('.jack')],
+    project_dir if use_signature_cache else None
+  )
+
+def compile_class(input_file_path, output_file_path, signature_index):
+  # Every class is compiled even after a failure, so one run reports all the errors. Returns whether it succeeded
+  try:
+    CompilationEngine(input_file_path, output_file_path, signature_index)
+  except CompilationError as error:
+    print(error, file=sys.stderr)
+    return False
+  return True
+
+def link(bundle_file_path, signature_index):
+  # Classes are compiled to a scratch directory, only the linked bundle is written next to the sources
+  linker = VMLinker()
+  with TemporaryDirectory() as build_dir:
+    compiled = True
+    for jack_file in jack_files:
+      class_file_path = os.path.join(build_dir, os.path.basename(jack_file['output_file_path']))
+      if compile_class(jack_file['input_file_path'], class_file_path, signature_index):
+        linker.addClass(class_file_path)
+      else:
+        compiled = False
+
+    if not compiled:
+      # An old bundle would otherwise be picked up as if it were the result of this build
+      if os.path.exists(bundle_file_path):
+        os.remove(bundle_file_path)
+      return False
+
+    linker.link(bundle_file_path)
+
+  # Per-class files from earlier builds would be loaded by the translator next to the bundle, duplicating every function
+  for jack_file in jack_files:
+    class_file_path = jack_file['output_file_path']
+    if class_file_path != bundle_file_path and os.path.exists(class_file_path):
+      os.remove(class_file_path)
+      print(f'Removed stale {class_file_path}, its class is part of {bundle_file_path}')
+  return True
+
+def bundle_file_path():
+  # A linked directory is bundled into <directory>/<directory name>.vm, a single linked file keeps its own output path
+  if os.path.isdir(input_file):
+    return os.path.join(input_file, os.path.basename(os.path.normpath(input_file)) + '.vm')
+  return jack_files[0]['output_file_path']
+
+def remove_stale_bundle():
+  # A bundle from an earlier --link build would be loaded by the translator next to the per-class files, duplicating every function
+  bundle = bundle_file_path()
+  class_file_paths = [jack_file['output_file_path'] for jack_file in jack_files]
+  if bundle not in class_file_paths and os.path.exists(bundle):
+    os.remove(bundle)
+    print(f'Removed stale {bundle}, its classes are now compiled to separate files')
 
 def main():
+  signature_index = build_signature_index()
+
+  if link_mode:
+    return link(bundle_file_path(), signature_index)
+
+  compiled = True
   for jack_file in jack_files:
-    CompilationEngine(jack_file['input_file_path'], jack_file['output_file_path'])
+    compiled = compile_class(jack_file['input_file_path'], jack_file['output_file_path'], signature_index) and compiled
+  remove_stale_bundle()
+  return compiled
 
 
-main()
+if not main():
+  sys.exit(1)
 print('Done')
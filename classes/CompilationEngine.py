@@ -1,6 +1,8 @@
+from typing import Union
 from classes.SymbolTable import SymbolTable
 from classes.VMWriter import VMWriter
 from classes.JackTokenizer import JackTokenizer
+from classes.Diagnostics import Diagnostics, CompilationError
 
 class CompilationEngine:
     '''Gets input from the JackAnalyzer, and writes its output using the VMWriter.'''
@@ -17,38 +19,148 @@ class CompilationEngine:
       '=': 'eq'
     }
     unary_operators = {'-': 'neg', '~': 'not'}
+    statement_keywords = ['let', 'if', 'while', 'do', 'return']
+    subroutine_keywords = ['constructor', 'function', 'method']
 
-    def __init__(self, input_file, output_file) -> None:
+    class Panic(Exception):
+      '''Unwinds the parser to the nearest statement or subroutine boundary after a syntax error.'''
+
+    def __init__(self, input_file, output_file, signature_index=None) -> None:
       self.tokenizer = JackTokenizer(input_file)
       self.vm_writer = VMWriter(output_file)
       self.symbol_table = SymbolTable()
+      # Optional SignatureIndex of the whole project, without it calls are resolved from local symbols alone
+      self.signature_index = signature_index
+      self.diagnostics = Diagnostics(input_file)
       self.advanceTokenizer()
-      self.compileClass()
+
+      try:
+        self.compileClass()
+        self.diagnostics.check()
+      except CompilationError:
+        # A failed compile leaves no .vm file behind
+        self.tokenizer.close()
+        self.vm_writer.discard()
+        raise
+
+      self.tokenizer.close()
+      self.close_output_file()
+
+    def __error(self, message: str, mark: tuple = None) -> None:
+      # Positions are looked up only once an error is reported, a mark of an earlier token points the error there
+      line, column = self.tokenizer.positionOf(mark or self.tokenizer.tokenMark())
+      self.diagnostics.error(line, column, message)
+
+    def __panic(self, message: str) -> None:
+      self.__error(message)
+      raise CompilationEngine.Panic()
+
+    def __describe_current_token(self) -> str:
+      if self.tokenizer.current_token is None:
+        return 'end of file'
+      return f"'{self.tokenizer.current_token}'"
 
     def __consume_token(self, token: str) -> None:
-      if self.tokenizer.current_token != token:
-        print('Does not match')
-      else:
+      if self.tokenizer.current_token is None or self.tokenizer.current_token != token:
+        self.__panic(f"Expected '{token}' but found {self.__describe_current_token()}")
+      self.advanceTokenizer()
+
+    def __consume_identifier(self) -> str:
+      identifier = self.tokenizer.current_token
+      if identifier is None or not identifier.isidentifier() or identifier in self.tokenizer.keywords:
+        self.__panic(f'Expected an identifier but found {self.__describe_current_token()}')
+      self.advanceTokenizer()
+      return identifier
+
+    def __check_defined(self, var_name: str) -> None:
+      # An undefined variable is not a syntax error, so parsing simply carries on
+      if var_name is not None and var_name.isidentifier() and self.symbol_table.kindOf(var_name) is None:
+        self.__error(f"Undefined variable '{var_name}'")
+
+    def __skip_group(self) -> None:
+      # Skips a bracketed group together with every group nested in it
+      depth = 0
+      while self.tokenizer.current_token is not None:
+        if self.tokenizer.current_token in ['(', '[', '{']:
+          depth += 1
+        elif self.tokenizer.current_token in [')', ']', '}']:
+          depth -= 1
         self.advanceTokenizer()
+        if depth == 0:
+          return
+
+    def __synchronize_statement(self) -> None:
+      # Skip the rest of the broken statement, up to its ';' or past its blocks, or up to the start of the next statement.
+      # Blocks are skipped whole, so their closing '}' is never mistaken for the end of the enclosing block.
+      while self.tokenizer.current_token not in self.statement_keywords + ['}', None]:
+        if self.tokenizer.current_token == ';':
+          self.advanceTokenizer()
+          return
+        elif self.tokenizer.current_token == '{':
+          self.__skip_group()
+          if self.tokenizer.current_token != 'else':
+            return
+        elif self.tokenizer.current_token in ['(', '[']:
+          self.__skip_group()
+        else:
+          # Includes a ')' or ']' left open by the broken statement
+          self.advanceTokenizer()
+
+    def __synchronize_class_var_dec(self) -> None:
+      # Skip past the ';' of the broken declaration, or up to the next class member or the '}' closing the class
+      while self.tokenizer.current_token not in ['static', 'field', '}', None] + self.subroutine_keywords:
+        if self.tokenizer.current_token == ';':
+          self.advanceTokenizer()
+          return
+        elif self.tokenizer.current_token == '{':
+          self.__skip_group()
+        else:
+          self.advanceTokenizer()
+
+    def __synchronize_subroutine(self) -> None:
+      # Skip up to the next subroutine declaration, or the '}' closing the class.
+      # Blocks are skipped whole, so the '}' of a subroutine body never closes the class.
+      while self.tokenizer.current_token not in self.subroutine_keywords + ['}', None]:
+        if self.tokenizer.current_token == '{':
+          self.__skip_group()
+        else:
+          self.advanceTokenizer()
 
     def close_output_file(self) -> None:
       self.vm_writer.close()
 
     def advanceTokenizer(self) -> None:
-      if self.tokenizer.hasMoreTokens():
-        self.tokenizer.advance()
+      # Past the end of the input the current token becomes None, which matches nothing the grammar expects
+      self.tokenizer.advance()
 
     def compileClass(self) -> None:
       '''Compile a complete class.'''
-      self.__consume_token('class')
-      self.class_name = self.tokenizer.current_token
-      self.__consume_token(self.tokenizer.current_token)
-      self.__consume_token('{')
-      self.compileClassVarDec()
-      self.compileSubroutineDec()
-      self.__consume_token('}')
+      try:
+        self.__consume_token('class')
+        self.class_name = self.__consume_identifier()
+        self.__consume_token('{')
+      except CompilationEngine.Panic:
+        # Without a class header there is nothing to compile the rest of the file into
+        return
 
-      self.close_output_file()
+      while True:
+        self.compileClassVarDec()
+        self.compileSubroutineDec()
+
+        # Subroutine bodies are consumed whole, so a '}' between class members closes the class
+        if self.tokenizer.current_token == '}':
+          self.advanceTokenizer()
+          break
+        if self.tokenizer.current_token is None:
+          self.__error("Expected '}' but found end of file")
+          return
+
+        # A stray token between class members, resume at the next member
+        self.__error(f'Unexpected {self.__describe_current_token()} in class {self.class_name}')
+        self.__synchronize_subroutine()
+
+      if self.tokenizer.current_token is not None:
+        self.__error(f'Unexpected {self.__describe_current_token()} after class {self.class_name}')
 
     def compileClassVarDec(self) -> None:
       '''Compiles a static variable declaration, or a field declaration.'''
@@ -59,22 +171,22 @@ class CompilationEngine:
           identifier["kind"] = 'STATIC' if self.tokenizer.current_token == 'static' else 'FIELD'
           self.__consume_token(self.tokenizer.current_token) # static or field
 
-          identifier["type"] = self.tokenizer.current_token
-          self.__consume_token(self.tokenizer.current_token) # type
-
-          identifier["name"] = self.tokenizer.current_token
-          self.symbol_table.define(identifier["name"], identifier["type"], identifier["kind"]) # add to class level symbol table
+          try:
+            identifier["type"] = self.tokenizer.current_token
+            self.__consume_token(self.tokenizer.current_token) # type
 
-          self.__consume_token(self.tokenizer.current_token) # varName
-          
-          while self.tokenizer.current_token == ',':
-            self.__consume_token(self.tokenizer.current_token) # ,
-
-            identifier["name"] = self.tokenizer.current_token
+            identifier["name"] = self.__consume_identifier() # varName
             self.symbol_table.define(identifier["name"], identifier["type"], identifier["kind"]) # add to class level symbol table
-            self.__consume_token(self.tokenizer.current_token) # varName
+            
+            while self.tokenizer.current_token == ',':
+              self.__consume_token(self.tokenizer.current_token) # ,
 
-          self.__consume_token(';')
+              identifier["name"] = self.__consume_identifier() # varName
+              self.symbol_table.define(identifier["name"], identifier["type"], identifier["kind"]) # add to class level symbol table
+
+            self.__consume_token(';')
+          except CompilationEngine.Panic:
+            self.__synchronize_class_var_dec()
           
         else:
           break
@@ -82,7 +194,7 @@ class CompilationEngine:
     def compileSubroutineDec(self) -> None:
       '''Compiles a complete method, function or constructor.'''
       while True:
-        if self.tokenizer.current_token in ['constructor', 'function', 'method']:
+        if self.tokenizer.current_token in self.subroutine_keywords:
           
           # Reset every time a new subroutine is started
           self.control_statement_labels = {
@@ -97,16 +209,17 @@ class CompilationEngine:
           self.compiling_constructor = True if self.tokenizer.current_token == 'constructor' else False 
 
           self.__consume_token(self.tokenizer.current_token) # constructor or function or method
-          self.__consume_token(self.tokenizer.current_token) # type
 
-          self.function_name = self.tokenizer.current_token
-          self.__consume_token(self.tokenizer.current_token) # subroutineName
-          self.__consume_token('(')
-          if self.tokenizer.tokenType() in ['IDENTIFIER', 'SYMBOL', 'KEYWORD']: 
+          try:
+            self.__consume_token(self.tokenizer.current_token) # type
+            self.function_name = self.__consume_identifier() # subroutineName
+            self.__consume_token('(')
             self.compileParameterList()
-          self.__consume_token(')')
+            self.__consume_token(')')
 
-          self.compileSubroutineBody()
+            self.compileSubroutineBody()
+          except CompilationEngine.Panic:
+            self.__synchronize_subroutine()
 
         else:
           break
@@ -121,17 +234,15 @@ class CompilationEngine:
         identifier["type"] = self.tokenizer.current_token
         self.__consume_token(self.tokenizer.current_token) # type
 
-        identifier["name"] = self.tokenizer.current_token
+        identifier["name"] = self.__consume_identifier() # varName
         self.symbol_table.define(identifier["name"], identifier["type"], 'ARG') # add argument to subroutine level symbol table
-        self.__consume_token(self.tokenizer.current_token) # varName
 
         while self.tokenizer.current_token == ',':
           self.__consume_token(self.tokenizer.current_token) # ,
           identifier["type"] = self.tokenizer.current_token
           self.__consume_token(self.tokenizer.current_token) # type
-          identifier["name"] = self.tokenizer.current_token
+          identifier["name"] = self.__consume_identifier() # varName
           self.symbol_table.define(identifier["name"], identifier["type"], 'ARG') # add argument to subroutine level symbol table
-          self.__consume_token(self.tokenizer.current_token) # varName
 
     def compileSubroutineBody(self) -> None:
       '''Compiles a subroutine's body.'''
@@ -155,48 +266,55 @@ class CompilationEngine:
 
         identifier = {}
         self.__consume_token('var')
-        identifier["type"] = self.tokenizer.current_token
-        self.__consume_token(self.tokenizer.current_token) # type
-        identifier["name"] = self.tokenizer.current_token
-        self.symbol_table.define(identifier["name"], identifier["type"], 'VAR') # add var (local) to subroutine level symbol table
-        self.__consume_token(self.tokenizer.current_token) # varName
-
-        while self.tokenizer.current_token == ',':
-          self.__consume_token(self.tokenizer.current_token) # ,
-          identifier["name"] = self.tokenizer.current_token
+        try:
+          identifier["type"] = self.tokenizer.current_token
+          self.__consume_token(self.tokenizer.current_token) # type
+          identifier["name"] = self.__consume_identifier() # varName
           self.symbol_table.define(identifier["name"], identifier["type"], 'VAR') # add var (local) to subroutine level symbol table
-          self.__consume_token(self.tokenizer.current_token) # varName
 
-        self.__consume_token(';')
+          while self.tokenizer.current_token == ',':
+            self.__consume_token(self.tokenizer.current_token) # ,
+            identifier["name"] = self.__consume_identifier() # varName
+            self.symbol_table.define(identifier["name"], identifier["type"], 'VAR') # add var (local) to subroutine level symbol table
+
+          self.__consume_token(';')
+        except CompilationEngine.Panic:
+          # Recovered inside the body, so the body's own '}' is not taken for the end of the class
+          self.__synchronize_statement()
       
     def compileStatements(self) -> None:
       '''Compiles a sequence of statements. Does not handle "{}". '''
-      while self.tokenizer.current_token in ['let', 'if', 'while', 'do', 'return']:
-        if self.tokenizer.current_token == 'let':
-          self.compileLet()
-        elif self.tokenizer.current_token == 'if':
-          # increment used label counts, so it stays unique in case there are nested statements
-          self.control_statement_labels["IF_TRUE"] += 1
-          self.control_statement_labels["IF_FALSE"] += 1
-          self.control_statement_labels["IF_END"] += 1
-          self.compileIf()
-        elif self.tokenizer.current_token == 'while':
-          self.control_statement_labels["WHILE_EXP"] += 1
-          self.control_statement_labels["WHILE_END"] += 1
-          self.compileWhile()
-        elif self.tokenizer.current_token == 'do':
-          self.compileDo()
-        elif self.tokenizer.current_token == 'return':
-          self.compileReturn()
+      while self.tokenizer.current_token not in ['}', None]:
+        try:
+          if self.tokenizer.current_token == 'let':
+            self.compileLet()
+          elif self.tokenizer.current_token == 'if':
+            # increment used label counts, so it stays unique in case there are nested statements
+            self.control_statement_labels["IF_TRUE"] += 1
+            self.control_statement_labels["IF_FALSE"] += 1
+            self.control_statement_labels["IF_END"] += 1
+            self.compileIf()
+          elif self.tokenizer.current_token == 'while':
+            self.control_statement_labels["WHILE_EXP"] += 1
+            self.control_statement_labels["WHILE_END"] += 1
+            self.compileWhile()
+          elif self.tokenizer.current_token == 'do':
+            self.compileDo()
+          elif self.tokenizer.current_token == 'return':
+            self.compileReturn()
+          else:
+            self.__panic(f'Expected a statement but found {self.__describe_current_token()}')
+        except CompilationEngine.Panic:
+          self.__synchronize_statement()
 
     def compileLet(self) -> None:
       '''Compiles a let statement.'''
       self.__consume_token('let')
       is_array = False
-      var_name = self.tokenizer.current_token
+      self.__check_defined(self.tokenizer.current_token)
+      var_name = self.__consume_identifier()
       segment = 'this' if self.symbol_table.kindOf(var_name) == 'field' else self.symbol_table.kindOf(var_name)
       index = self.symbol_table.indexOf(var_name)
-      self.__consume_token(self.tokenizer.current_token)
       
       if self.tokenizer.current_token == '[':
         is_array = True
@@ -297,46 +415,66 @@ class CompilationEngine:
 
     def compileSubroutineCall(self) -> None:
       '''Compiles a subroutine call'''
-      vm_subroutine_call_name = None
-      # How many arguments does the function take. In case of a class method, it has at least 1 (the class itself)
-      self.vm_subroutine_args = 0
+      # How many arguments does the function take. In case of a method, it has at least 1 (the object itself)
+      vm_subroutine_args = 0
+      call_mark = self.tokenizer.tokenMark()
+
       if self.tokenizer.next_token == "(":
-        # Push base address of THIS before calling a method
-        self.vm_writer.writePush('pointer', 0)
-        vm_subroutine_call_name = f'{self.class_name}.{self.tokenizer.current_token}'
-        self.__consume_token(self.tokenizer.current_token) # subroutineName
-        self.vm_subroutine_args += 1
-        self.__consume_token("(")
-        self.compileExpressionList()
-        self.__consume_token(")")
+        vm_class_name = self.class_name
+        vm_subroutine_name = self.__consume_identifier() # subroutineName
+        signature = self.__signature(vm_class_name, vm_subroutine_name, call_mark)
+
+        # Subroutines without a known signature are assumed to be methods of this class
+        if signature is None or signature['kind'] == 'method':
+          if signature is not None and not (self.compiling_method or self.compiling_constructor):
+            self.__error(f'Method {vm_class_name}.{vm_subroutine_name} called from a function, which has no object', call_mark)
+          # Push base address of THIS before calling a method
+          self.vm_writer.writePush('pointer', 0)
+          vm_subroutine_args += 1
       else:
-        # class method call.
         # vm_class_name can be either className or user defined variable name
         vm_class_name = self.tokenizer.current_token
         kind_of_token = self.symbol_table.kindOf(vm_class_name) # is it field or local?
         type_of_token = self.symbol_table.typeOf(vm_class_name)
         index_of_token = self.symbol_table.indexOf(vm_class_name)
 
+        self.__consume_identifier() # className|varName
+        self.__consume_token(".")
+        vm_subroutine_name = self.__consume_identifier() # subroutineName
+
         # Handle method calls.
         if kind_of_token is not None:
           # Change name to the type of variable which will be the actual class name
           vm_class_name = type_of_token
-          self.vm_subroutine_args += 1
+          vm_subroutine_args += 1
           segment = 'this' if kind_of_token == 'field' else kind_of_token
           self.vm_writer.writePush(segment, index_of_token)
 
-        self.__consume_token(self.tokenizer.current_token) # className|varName
-        self.__consume_token(".")
-        
-        vm_subroutine_name = self.tokenizer.current_token
-        self.__consume_token(self.tokenizer.current_token) # subroutineName
-        self.__consume_token("(")
-        self.compileExpressionList()
-        self.__consume_token(")")
-          
-        vm_subroutine_call_name = f'{vm_class_name}.{vm_subroutine_name}'
-          
-      self.vm_writer.writeCall(vm_subroutine_call_name, self.vm_subroutine_args)
+        signature = self.__signature(vm_class_name, vm_subroutine_name, call_mark)
+        if signature is not None and (signature['kind'] == 'method') != (kind_of_token is not None):
+          if kind_of_token is None:
+            self.__error(f'Method {vm_class_name}.{vm_subroutine_name} called without an object', call_mark)
+          else:
+            self.__error(f'{signature["kind"].capitalize()} {vm_class_name}.{vm_subroutine_name} called on an object', call_mark)
+
+      self.__consume_token("(")
+      argument_count = self.compileExpressionList()
+      self.__consume_token(")")
+
+      if signature is not None and argument_count != signature['parameter_count']:
+        self.__error(f'{vm_class_name}.{vm_subroutine_name} expects {signature["parameter_count"]} argument(s) but got {argument_count}', call_mark)
+
+      self.vm_writer.writeCall(f'{vm_class_name}.{vm_subroutine_name}', vm_subroutine_args + argument_count)
+
+    def __signature(self, class_name: str, subroutine_name: str, call_mark: tuple) -> Union[dict, None]:
+      # Only classes of the indexed project are checked, anything else (e.g. the OS) is trusted as written
+      if self.signature_index is None or not self.signature_index.hasClass(class_name):
+        return None
+
+      signature = self.signature_index.signatureOf(class_name, subroutine_name)
+      if signature is None and self.signature_index.hasAllSignatures(class_name):
+        self.__error(f'Class {class_name} has no subroutine {subroutine_name}', call_mark)
+      return signature
 
     def compileExpression(self) -> None:
       '''Compiles an expression.'''
@@ -358,6 +496,13 @@ class CompilationEngine:
 
     def compileTerm(self) -> None:
       '''Compiles a term.'''
+      if self.tokenizer.current_token is None:
+        self.__panic('Expected an expression but found end of file')
+      try:
+        self.tokenizer.tokenType()
+      except ValueError:
+        self.__panic(f'Unexpected character {self.__describe_current_token()}')
+
       if self.tokenizer.tokenType() in ['INT_CONST', 'STRING_CONST', 'KEYWORD']:
         
         if self.tokenizer.tokenType() == 'INT_CONST':
@@ -390,11 +535,11 @@ class CompilationEngine:
         self.__consume_token(")")
       elif self.tokenizer.next_token == "[":
         # array expression
-        var_name = self.tokenizer.current_token
+        self.__check_defined(self.tokenizer.current_token)
+        var_name = self.__consume_identifier()
         segment = 'this' if self.symbol_table.kindOf(var_name) == 'field' else self.symbol_table.kindOf(var_name)
         index = self.symbol_table.indexOf(var_name)
 
-        self.__consume_token(self.tokenizer.current_token)
         self.__consume_token("[")
         self.compileExpression()
         self.__consume_token("]")
@@ -407,17 +552,23 @@ class CompilationEngine:
         self.compileSubroutineCall()
       else:
         # varName
+        if self.tokenizer.tokenType() != 'IDENTIFIER':
+          self.__panic(f'Expected an expression but found {self.__describe_current_token()}')
+        self.__check_defined(self.tokenizer.current_token)
         kind_of_token = self.symbol_table.kindOf(self.tokenizer.current_token) # is it field or local?
         segment = 'this' if kind_of_token == 'field' else kind_of_token
         self.vm_writer.writePush(segment, self.symbol_table.indexOf(self.tokenizer.current_token))
-        self.__consume_token(self.tokenizer.current_token)
+        self.__consume_identifier()
 
-    def compileExpressionList(self) -> None:
-      '''Compiles an expression list.'''
+    def compileExpressionList(self) -> int:
+      '''Compiles an expression list. Returns the number of expressions in the list.'''
+      expression_count = 0
       if self.tokenizer.current_token != ")":
         self.compileExpression()
-        self.vm_subroutine_args += 1
+        expression_count += 1
         while self.tokenizer.current_token == ',':
           self.__consume_token(",")
           self.compileExpression()
-          self.vm_subroutine_args += 1
+          expression_count += 1
+
+      return expression_count
@@ -0,0 +1,42 @@
+class Diagnostic:
+  '''A single compile error pointing at a position in a .jack file'''
+
+  def __init__(self, file_path: str, line: int, column: int, message: str) -> None:
+    self.file_path = file_path
+    self.line = line
+    self.column = column
+    self.message = message
+
+  def __str__(self) -> str:
+    return f'{self.file_path}:{self.line}:{self.column}: error: {self.message}'
+
+
+class CompilationError(Exception):
+  '''Raised when a class could not be compiled, carries every diagnostic that was collected'''
+
+  def __init__(self, diagnostics: list) -> None:
+    super().__init__('\n'.join(str(diagnostic) for diagnostic in diagnostics))
+    self.diagnostics = diagnostics
+
+
+class Diagnostics:
+  '''Collects the errors found while compiling a single .jack file'''
+
+  # Past this many errors the rest of the file is most likely noise, so compilation stops
+  max_errors = 20
+
+  def __init__(self, file_path: str) -> None:
+    self.file_path = file_path
+    self.errors = []
+
+  def error(self, line: int, column: int, message: str) -> None:
+    '''Records an error, stops the compilation once too many errors were found'''
+    self.errors.append(Diagnostic(self.file_path, line, column, message))
+
+    if len(self.errors) >= self.max_errors:
+      raise CompilationError(self.errors)
+
+  def check(self) -> None:
+    '''Raises a CompilationError if any errors were recorded'''
+    if self.errors:
+      raise CompilationError(self.errors)
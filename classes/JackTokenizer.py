@@ -1,4 +1,9 @@
-from re import compile, findall
+import mmap as mmap_module
+from itertools import islice
+from mmap import mmap, ACCESS_READ, ALLOCATIONGRANULARITY
+from os import fstat
+from re import compile, DOTALL
+
 class JackTokenizer:
   '''Handles the compiler's input.'''
 
@@ -15,7 +20,30 @@ class JackTokenizer:
     '-', '*', '/', '&', '|', '<', '>', '=', '~'
   ]
 
-  token_compiler = compile("\"\s*.+\s*\"|[\w]+|[\.,;\+\-\*/&\|<>=~\(\)\{\}\[\]]")
+  # The input is tokenized a chunk at a time. A chunk is cut after a whitespace, or after a string or comment still open there,
+  # so a cut never falls inside a token, a string or a comment.
+  chunk_size = 16 * 1024
+  whitespace_compiler = compile(rb'\s')
+  # Lexes only comments and strings, and stops at one that is still open at the end of the chunk.
+  # A quote with no closing quote on its line is a token of its own.
+  chunk_boundary_compiler = compile(rb'(?:[^/"]+|//[^\n]*\n|"[^"\n]*"|"(?=[^"\n]*\n)|/\*.*?\*/|/(?![/*]))*', DOTALL)
+  # The rest of that string or comment, a comment that is never closed runs to the end of the input
+  chunk_tail_compiler = compile(rb'//[^\n]*\n?|"[^"\n]*"|"|/\*.*?(?:\*/|\Z)', DOTALL)
+
+  # Each match is the comments and whitespace before a token, plus the token itself.
+  # At the end of a chunk only the trailing comments and whitespace match, and no token.
+  # Any other stray character becomes a token of its own, so it can be reported instead of silently dropped.
+  token_compiler = compile(
+    r'(?:\s|//[^\n]*|/\*.*?\*/)*'
+    r'(?:("[^"\n]*"|\w+|[\.,;\+\-\*/&\|<>=~\(\)\{\}\[\]]|\S)|\Z)',
+    DOTALL
+  )
+
+  # UTF-8 continuation bytes, leaving them out of a count counts characters
+  continuation_bytes = bytes(range(0x80, 0xc0))
+
+  # How many bytes of already scanned input are kept mapped before they are handed back to the OS
+  release_window = 256 * ALLOCATIONGRANULARITY
 
   # integerConstant: 0 - 32767
   # stringConstant: a sequence of Unicode characters
@@ -33,68 +61,159 @@ class JackTokenizer:
   def __init__(self, input_file) -> None:
     '''Opens .jack input file and prepares to tokenize it. '''
     
-    self.input_file = open(input_file, 'r')
-    # Whether we have processed a single line of input file, initially it is true since no line was read yet.
-    self.current_line_tokens = None
-    self.amount_of_tokens = 0
-    self.current_token_index = 0
+    self.input_file = open(input_file, 'rb')
+    # The file is memory-mapped and scanned lazily, so only the tokens of one chunk are ever held in memory
+    self.input_map = mmap(self.input_file.fileno(), 0, access=ACCESS_READ) if fstat(self.input_file.fileno()).st_size else None
+    self.input_size = len(self.input_map) if self.input_map is not None else 0
+    self.scanned = 0
+    self.released = 0
+    # The chunk, its tokens and the index of the next token in them
+    self.chunk = None
+    self.chunk_tokens = []
+    self.chunk_length = 0
+    self.next_index = 0
     self.current_token = None
-    self.next_token = None
-    self.is_final_token = True
+    # Tokens only know their chunk and their index in it, the line and column are worked out when they are asked for
+    self.current_chunk = None
+    self.current_index = 0
+    self.counted_offset = 0
+    self.counted_lines = 1
+    self.line_start = 0
+    self.__read_next_token()
 
-  def __close_input_file(self):
+  @property
+  def line(self) -> int:
+    '''1-based line of the current token, used for error reporting.'''
+    return self.positionOf(self.tokenMark())[0]
+
+  @property
+  def column(self) -> int:
+    '''1-based column of the current token, used for error reporting.'''
+    return self.positionOf(self.tokenMark())[1]
+
+  def close(self) -> None:
+    '''Closes the input file, any tokens not read yet are dropped.'''
+    if self.input_file.closed:
+      return
+    if self.input_map is not None:
+      self.input_map.close()
     self.input_file.close()
 
-  def __read_line(self): 
-    return self.input_file.readline().strip(" ")
+  def __read_next_token(self) -> None:
+    while self.next_index == self.chunk_length:
+      if not self.__read_chunk():
+        self.next_token = None
+        return
 
-  def hasMoreTokens(self) -> bool:
-    '''Does the input file has more tokens?'''
-    if self.is_final_token is True:
-      # End of the file will return empty space
-      current_line = self.__read_line()
-      # Handle single and multi line comments and new lines
-      while True:
-        if current_line.isspace():
-          current_line = self.__read_line()
-        elif current_line.startswith("/**"):
-          while True:
-            if current_line.endswith("*/\n"):
-              current_line = self.__read_line()
-              break
-            else:  
-              current_line = self.__read_line()
-        elif current_line.startswith("//"):
-          current_line = self.__read_line()
-        elif current_line.find('//') != -1:
-          current_line = current_line.split('//')[0]
-        else:
-          break
-      # returning a list of all the different tokens in the currently read line
-      self.current_line_tokens = findall(self.token_compiler, current_line)
-      self.amount_of_tokens = len(self.current_line_tokens)
-    
-    if self.amount_of_tokens == 0:
-      self.__close_input_file()
+    self.next_token = self.chunk_tokens[self.next_index]
+
+  def __read_chunk(self) -> bool:
+    if self.scanned == self.input_size:
       return False
 
-    # If the index is out of list range we have exhausted the list of tokens
-    if self.current_token_index + 1 == self.amount_of_tokens:
-      self.is_final_token = True
-    else: 
-      self.is_final_token = False
-      self.next_token = self.current_line_tokens[self.current_token_index + 1]
+    chunk_start = self.scanned
+    whitespace = self.whitespace_compiler.search(self.input_map, chunk_start + self.chunk_size)
+    chunk_end = whitespace.end() if whitespace is not None else self.input_size
+
+    # Move the cut past a string or comment that is still open there
+    lexed_end = self.chunk_boundary_compiler.match(self.input_map, chunk_start, chunk_end).end()
+    while lexed_end < chunk_end:
+      tail_end = self.chunk_tail_compiler.match(self.input_map, lexed_end).end()
+      if tail_end >= chunk_end:
+        chunk_end = tail_end
+        break
+      # Only a lone quote ends before the cut, lexing goes on after it
+      lexed_end = self.chunk_boundary_compiler.match(self.input_map, tail_end, chunk_end).end()
 
+    chunk_text = self.input_map[chunk_start:chunk_end].decode()
+    self.chunk = (chunk_start, chunk_text)
+    self.chunk_tokens = [token for token in self.token_compiler.findall(chunk_text) if token]
+    self.chunk_length = len(self.chunk_tokens)
+    self.next_index = 0
+    self.scanned = chunk_end
+
+    # Drop pages behind the scan position so resident memory stays flat for huge inputs
+    if chunk_start - self.released > self.release_window:
+      release_end = chunk_start - chunk_start % ALLOCATIONGRANULARITY
+      self.__release_pages(self.released, release_end)
+      self.released = release_end
     return True
 
+  def __release_pages(self, start, end):
+    # Only the pages scanned since the previous release, earlier ones were already handed back
+    if hasattr(mmap_module, 'MADV_DONTNEED'):
+      self.input_map.madvise(mmap_module.MADV_DONTNEED, start, end - start)
+
+  def __count_lines(self, offset: int) -> tuple:
+    # Counts newlines from the last counted offset up to the given one, a window at a time to keep memory flat.
+    # Returns the line number at the offset and where that line starts.
+    if offset < self.counted_offset:
+      self.counted_offset = 0
+      self.counted_lines = 1
+      self.line_start = 0
+
+    for window_start, window in self.__windows(self.counted_offset, offset):
+      newlines = window.count(b'\n')
+      if newlines:
+        self.counted_lines += newlines
+        self.line_start = window_start + window.rfind(b'\n') + 1
+    self.counted_offset = offset
+
+    return self.counted_lines, self.line_start
+
+  def __count_characters(self, start: int, end: int) -> int:
+    return sum(len(window.translate(None, self.continuation_bytes)) for _, window in self.__windows(start, end))
+
+  def __windows(self, start: int, end: int):
+    # Reads the input between the offsets a window at a time, to keep memory flat
+    for window_start in range(start, end, self.release_window):
+      window_end = min(end, window_start + self.release_window)
+      yield window_start, self.input_map[window_start:window_end]
+      # Windows the scan has already released are handed back again once read
+      if window_end <= self.released:
+        self.__release_pages(window_start - window_start % ALLOCATIONGRANULARITY, window_end)
+
+  def tokenMark(self) -> tuple:
+    '''Returns a mark of the current token, its position can be looked up later with positionOf.'''
+    return self.current_chunk, self.current_index
+
+  def positionOf(self, mark: tuple) -> tuple:
+    '''Returns the 1-based line and column of a marked token. Only available while the input file is open.'''
+    chunk, index = mark
+    if chunk is None:
+      return 1, 1
+
+    # The token's place in its chunk is found by lexing the chunk again, which is only ever done to report an error
+    chunk_start, chunk_text = chunk
+    token_matches = (match for match in self.token_compiler.finditer(chunk_text) if match.start(1) != -1)
+    offset = next(islice(token_matches, index, None)).start(1)
+
+    line, line_start = self.__count_lines(chunk_start)
+    newlines = chunk_text.count('\n', 0, offset)
+    if newlines:
+      return line + newlines, offset - chunk_text.rfind('\n', 0, offset)
+    return line, self.__count_characters(line_start, chunk_start) + offset + 1
+
+  def hasMoreTokens(self) -> bool:
+    '''Does the input file has more tokens?'''
+    return self.next_token is not None
+
   def advance(self) -> None:
-    '''Gets the next token from the input, and makes it a current token.'''
-    self.current_token = self.current_line_tokens[self.current_token_index]
-    
-    if self.is_final_token:
-      self.current_token_index = 0
-    else: 
-      self.current_token_index += 1
+    '''Gets the next token from the input, and makes it a current token. Past the end of the input the current token is None.'''
+    self.current_token = self.next_token
+    # At the end of the input the position of the last token is kept
+    if self.current_token is None:
+      return
+
+    self.current_index = self.next_index
+    # The first token of a chunk moves the position over to that chunk
+    if self.current_index == 0:
+      self.current_chunk = self.chunk
+    self.next_index += 1
+    if self.next_index < self.chunk_length:
+      self.next_token = self.chunk_tokens[self.next_index]
+    else:
+      self.__read_next_token()
   
   def tokenType(self) -> str:
     '''Returns a token type of the current token.'''
@@ -106,7 +225,7 @@ class JackTokenizer:
       return self.token_types['IDENTIFIER']
     elif self.current_token.isdigit():
       return self.token_types['INT_CONST']
-    elif self.current_token.startswith("\""):
+    elif len(self.current_token) > 1 and self.current_token.startswith("\"") and self.current_token.endswith("\""):
       return self.token_types['STRING_CONST']
     else:
       # Questionable choice...
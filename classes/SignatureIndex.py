@@ -0,0 +1,141 @@
+import json
+import os
+from mmap import mmap, ACCESS_READ
+from re import compile, DOTALL
+from typing import Union
+
+class SignatureIndex:
+  '''Project-wide index of subroutine signatures, used to resolve and check subroutine calls'''
+
+  # Persisted next to the .jack sources, entries are reused while their file is unchanged
+  cache_file_name = '.jack_signatures.json'
+  cache_version = 2
+
+  comment_compiler = compile(rb'//[^\n]*|/\*.*?\*/', DOTALL)
+
+  # Whitespace or a comment, wherever the header of a declaration may have whitespace.
+  # Each comment can only be matched one way, so a header that does not match fails without backtracking through them.
+  separator = rb'(?:\s|//[^\n]*(?![^\n])|/\*(?:[^*]|\*(?!/))*\*/)'
+
+  # Matches only what the index needs: braces to track depth, the class name and subroutine headers.
+  # Everything in between, comments and strings included, is one undecoded "skip" match, so a body costs a few matches at most.
+  declaration_compiler = compile(
+    # A 'c', 'f' or 'm' is only examined at the start of a word, as it may begin class or a subroutine keyword
+    rb'(?P<skip>(?:[^/"{}cfm]+|(?<=\w)[cfm]|[cfm](?!(?:lass|onstructor|unction|ethod)\b)|//[^\n]*|"[^"\n]*"|/\*.*?\*/|[/"])+)'
+    rb'|(?P<open>\{)|(?P<close>\})'
+    rb'|\bclass' + separator + rb'+(?P<class_name>\w+)'
+    rb'|\b(?P<kind>constructor|function|method)' + separator + rb'+(?P<return_type>\w+)' + separator + rb'+(?P<name>\w+)' + separator + rb'*'
+    rb'\((?P<parameters>(?:[^)/{};]|//[^\n]*(?![^\n])|/\*(?:[^*]|\*(?!/))*\*/|/(?![/*]))*)\)'
+    # A subroutine keyword that does not start a well-formed header
+    rb'|(?P<unparsed>\b(?:constructor|function|method)\b)',
+    DOTALL
+  )
+
+  def __init__(self, jack_files: list, cache_dir: str = None) -> None:
+    '''Builds the index for the given .jack files, re-scanning only the files changed since the last build.
+    Without a cache_dir nothing is persisted and every file is scanned.'''
+    self.cache_file_path = os.path.join(cache_dir, self.cache_file_name) if cache_dir is not None else None
+    self.classes = {}
+    # Classes with a subroutine header the scan could not read, calls to subroutines missing from them are not reported
+    self.incomplete_classes = set()
+
+    cached_files = self.__load_cache()
+    indexed_files = {}
+
+    for jack_file in jack_files:
+      cache_key = os.path.basename(jack_file)
+      try:
+        entry = self.__index_file(jack_file, cached_files.get(cache_key))
+      except OSError:
+        # An unreadable file is left out of the index, calls into it are simply not checked
+        continue
+
+      indexed_files[cache_key] = entry
+      if entry['class_name'] is not None:
+        self.classes[entry['class_name']] = entry['subroutines']
+        if not entry['complete']:
+          self.incomplete_classes.add(entry['class_name'])
+
+    if self.cache_file_path is not None and indexed_files != cached_files:
+      self.__save_cache(indexed_files)
+
+  def __index_file(self, jack_file: str, cached_entry: Union[dict, None]) -> dict:
+    # The cached entry is reused while the file is unchanged, otherwise the file is scanned again
+    stat = os.stat(jack_file)
+    if cached_entry is not None and cached_entry['mtime_ns'] == stat.st_mtime_ns and cached_entry['size'] == stat.st_size:
+      return cached_entry
+
+    class_name, subroutines, complete = self.__scan(jack_file)
+    return {
+      'mtime_ns': stat.st_mtime_ns,
+      'size': stat.st_size,
+      'class_name': class_name,
+      'subroutines': subroutines,
+      'complete': complete
+    }
+
+  def __load_cache(self) -> dict:
+    if self.cache_file_path is None:
+      return {}
+    try:
+      with open(self.cache_file_path, 'r') as cache_file:
+        cache = json.load(cache_file)
+    except (OSError, ValueError):
+      return {}
+
+    if not isinstance(cache, dict) or cache.get('version') != self.cache_version:
+      return {}
+    return cache.get('files', {})
+
+  def __save_cache(self, indexed_files: dict) -> None:
+    # The cache is only an optimization, a read-only source directory simply goes without it
+    try:
+      with open(self.cache_file_path, 'w') as cache_file:
+        json.dump({'version': self.cache_version, 'files': indexed_files}, cache_file)
+    except OSError:
+      pass
+
+  def __scan(self, jack_file: str) -> tuple:
+    with open(jack_file, 'rb') as input_file:
+      if os.fstat(input_file.fileno()).st_size == 0:
+        return None, {}, True
+      with mmap(input_file.fileno(), 0, access=ACCESS_READ) as input_map:
+        return self.__scan_declarations(input_map)
+
+  def __scan_declarations(self, input_map) -> tuple:
+    # Runs in its own frame so no match is left referencing the map when it is closed
+    class_name = None
+    subroutines = {}
+    complete = True
+    depth = 0
+
+    for match in self.declaration_compiler.finditer(input_map):
+      if match.lastgroup == 'open':
+        depth += 1
+      elif match.lastgroup == 'close':
+        depth -= 1
+      elif match.lastgroup == 'class_name' and class_name is None:
+        class_name = match.group('class_name').decode()
+      elif match.lastgroup == 'parameters' and depth == 1:
+        parameters = self.comment_compiler.sub(b'', match.group('parameters')).strip()
+        subroutines[match.group('name').decode()] = {
+          'kind': match.group('kind').decode(),
+          'parameter_count': parameters.count(b',') + 1 if parameters else 0,
+          'return_type': match.group('return_type').decode()
+        }
+      elif match.lastgroup == 'unparsed' and depth == 1:
+        complete = False
+
+    return class_name, subroutines, complete
+
+  def hasClass(self, class_name: str) -> bool:
+    '''Is the class part of the indexed project? Classes outside of it (e.g. the OS) are not checked'''
+    return class_name in self.classes
+
+  def hasAllSignatures(self, class_name: str) -> bool:
+    '''Was every subroutine header of the class read? If not, a subroutine missing from the index may still exist'''
+    return class_name not in self.incomplete_classes
+
+  def signatureOf(self, class_name: str, subroutine_name: str) -> Union[dict, None]:
+    '''Returns the kind, parameter count and return type of the subroutine. Returns None if it is unknown'''
+    return self.classes.get(class_name, {}).get(subroutine_name)
@@ -0,0 +1,92 @@
+class VMLinker:
+  '''Links the .vm files of compiled classes into a single relocated .vm bundle'''
+
+  # Functions the VM bootstrap may call, in order of preference
+  entry_points = ['Sys.init', 'Main.main']
+
+  def __init__(self) -> None:
+    self.functions = {}
+    self.static_count = 0
+
+  def addClass(self, vm_file: str) -> None:
+    '''Reads a compiled class and relocates its static segment after the statics of previously added classes'''
+    static_base = self.static_count
+    function_name = None
+
+    with open(vm_file, 'r') as vm_input:
+      for line in vm_input:
+        command = line.split()
+        if not command:
+          continue
+
+        if command[0] == 'function':
+          function_name = command[1]
+          self.functions[function_name] = [line.strip()]
+          continue
+
+        if command[0] in ['push', 'pop'] and command[1] == 'static':
+          index = static_base + int(command[2])
+          self.static_count = max(self.static_count, index + 1)
+          line = f'{command[0]} static {index}'
+
+        self.functions[function_name].append(line.strip())
+
+  def __deduplicate(self) -> None:
+    # Functions with identical bodies are merged into the first one seen, calls to the others are redirected
+    seen_bodies = {}
+    aliases = {}
+
+    for name, commands in self.functions.items():
+      if name in self.entry_points:
+        continue
+      body = (commands[0].split()[2],) + tuple(commands[1:])
+      if body in seen_bodies:
+        aliases[name] = seen_bodies[body]
+      else:
+        seen_bodies[body] = name
+
+    for name in aliases:
+      del self.functions[name]
+
+    for name, commands in self.functions.items():
+      for i, command in enumerate(commands):
+        if command.startswith('call '):
+          _, callee, n_args = command.split()
+          if callee in aliases:
+            commands[i] = f'call {aliases[callee]} {n_args}'
+
+  def __callees(self, name: str) -> list:
+    # Callees ordered by how often they are called, ties keep the order of their first call
+    call_counts = {}
+    for command in self.functions[name]:
+      if command.startswith('call '):
+        callee = command.split()[1]
+        call_counts[callee] = call_counts.get(callee, 0) + 1
+
+    return sorted(call_counts, key=lambda callee: -call_counts[callee])
+
+  def __order(self) -> list:
+    # Lay out functions depth-first from the entry point, so callers sit next to the code they call most
+    ordered = []
+    visited = set()
+    stack = [name for name in reversed(self.entry_points) if name in self.functions]
+
+    while stack:
+      name = stack.pop()
+      if name in visited or name not in self.functions:
+        continue
+      visited.add(name)
+      ordered.append(name)
+      stack.extend(reversed(self.__callees(name)))
+
+    # Functions never reached from the entry point keep their original order
+    ordered.extend(name for name in self.functions if name not in visited)
+    return ordered
+
+  def link(self, output_file: str) -> None:
+    '''Writes all added classes to a single .vm file'''
+    self.__deduplicate()
+
+    with open(output_file, 'w') as vm_output:
+      for name in self.__order():
+        vm_output.write('\n'.join(self.functions[name]) + '\n')
@@ -1,3 +1,5 @@
+import os
+
 class VMWriter:
   '''Emits VM code to the output .vm file'''
   
@@ -48,4 +50,9 @@ class VMWriter:
 
   def close(self) -> None:
     '''Closes the output file'''
-    self.output_file.close()
\ No newline at end of file
+    self.output_file.close()
+
+  def discard(self) -> None:
+    '''Closes and removes the output file, used when compilation fails'''
+    self.output_file.close()
+    os.remove(self.output_file.name)
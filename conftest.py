@@ -0,0 +1 @@
+# Lets the tests import the compiler's `classes` package from the repository root
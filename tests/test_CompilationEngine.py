@@ -0,0 +1,120 @@
+import pytest
+
+from classes.CompilationEngine import CompilationEngine
+from classes.Diagnostics import CompilationError
+from classes.SignatureIndex import SignatureIndex
+
+def compile_errors(tmp_path, source):
+  '''Compiles a Main class and returns its diagnostics as (line, message) pairs'''
+  jack_file = tmp_path / 'Main.jack'
+  vm_file = tmp_path / 'Main.vm'
+  jack_file.write_text(source)
+  signature_index = SignatureIndex([str(jack_file)], str(tmp_path))
+
+  with pytest.raises(CompilationError) as error:
+    CompilationEngine(str(jack_file), str(vm_file), signature_index)
+
+  assert not vm_file.exists()
+  return [(diagnostic.line, diagnostic.message) for diagnostic in error.value.diagnostics]
+
+def test_valid_class_compiles(tmp_path):
+  jack_file = tmp_path / 'Main.jack'
+  jack_file.write_text('class Main {\n  function void main() {\n    do Output.printInt(1);\n    return;\n  }\n}\n')
+
+  CompilationEngine(str(jack_file), str(tmp_path / 'Main.vm'))
+
+  assert (tmp_path / 'Main.vm').read_text().splitlines() == [
+    'function Main.main 0', 'push constant 1', 'call Output.printInt 1', 'pop temp 0', 'push constant 0', 'return'
+  ]
+
+def test_error_in_block_condition_recovers_after_the_block(tmp_path):
+  errors = compile_errors(tmp_path, '''class Main {
+  function void main() {
+    var int x;
+    while (x < ) {
+      if (x) { let x = x + 1; } else { let x = 0; }
+    }
+    retrun;
+    do Main.f(1, 2);
+    return;
+  }
+  function void f(int a) {
+    let q = 1;
+    return;
+  }
+}
+''')
+
+  assert errors == [
+    (4, "Expected an expression but found ')'"),
+    (7, "Expected a statement but found 'retrun'"),
+    (8, 'Main.f expects 1 argument(s) but got 2'),
+    (12, "Undefined variable 'q'"),
+  ]
+
+def test_errors_in_class_body_recover_at_the_next_member(tmp_path):
+  errors = compile_errors(tmp_path, '''class Main {
+  field int 5;
+  static int count;
+  function void main() {
+    let count = missing;
+    return;
+  }
+  oops
+  function void f() {
+    let q = 1;
+    return;
+  }
+}
+''')
+
+  assert errors == [
+    (2, "Expected an identifier but found '5'"),
+    (5, "Undefined variable 'missing'"),
+    (8, "Unexpected 'oops' in class Main"),
+    (10, "Undefined variable 'q'"),
+  ]
+
+def test_tokens_after_the_class_are_reported_where_they_are(tmp_path):
+  errors = compile_errors(tmp_path, '''class Main {
+  function void main() { return; }
+}
+}
+''')
+
+  assert errors == [(4, "Unexpected '}' after class Main")]
+
+def test_broken_subroutine_does_not_close_the_class(tmp_path):
+  errors = compile_errors(tmp_path, '''class Main {
+  function void f(int a, ) {
+    if (a) { let a = 1; }
+    return;
+  }
+  function void g() {
+    var int 5;
+    return;
+  }
+  function void h() {
+    let q = 1;
+    return;
+  }
+}
+''')
+
+  assert errors == [
+    (2, "Expected an identifier but found '{'"),
+    (7, "Expected an identifier but found '5'"),
+    (11, "Undefined variable 'q'"),
+  ]
+
+def test_calls_into_commented_headers_are_resolved(tmp_path):
+  jack_file = tmp_path / 'Main.jack'
+  jack_file.write_text('''class Main {
+  function /** returns */ int a(int x) { return x; }
+  function void main() { do Main.a(1); return; }
+}
+''')
+
+  CompilationEngine(str(jack_file), str(tmp_path / 'Main.vm'), SignatureIndex([str(jack_file)]))
+
+  assert 'call Main.a 1' in (tmp_path / 'Main.vm').read_text().splitlines()
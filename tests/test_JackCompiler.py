@@ -0,0 +1,29 @@
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+def compile_project(project_dir, *options):
+  return subprocess.run(
+    [sys.executable, str(REPO_ROOT / 'JackCompiler.py'), str(project_dir), *options],
+    capture_output=True, text=True
+  )
+
+def vm_files_of(project_dir):
+  return sorted(path.name for path in project_dir.glob('*.vm'))
+
+def test_switching_modes_removes_the_other_modes_output(tmp_path):
+  project_dir = tmp_path / 'Game'
+  project_dir.mkdir()
+  (project_dir / 'Main.jack').write_text('class Main {\n  function void main() {\n    do Ball.move();\n    return;\n  }\n}\n')
+  (project_dir / 'Ball.jack').write_text('class Ball {\n  function void move() {\n    return;\n  }\n}\n')
+
+  assert compile_project(project_dir).returncode == 0
+  assert vm_files_of(project_dir) == ['Ball.vm', 'Main.vm']
+
+  assert compile_project(project_dir, '--link').returncode == 0
+  assert vm_files_of(project_dir) == ['Game.vm']
+
+  assert compile_project(project_dir).returncode == 0
+  assert vm_files_of(project_dir) == ['Ball.vm', 'Main.vm']
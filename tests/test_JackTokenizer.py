@@ -0,0 +1,88 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from classes.JackTokenizer import JackTokenizer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Tokenizes a file in a fresh interpreter and prints its peak resident memory in KB.
+# VmHWM is used because ru_maxrss carries over the parent's peak across fork and exec.
+PEAK_RSS_SCRIPT = '''
+import sys
+from classes.JackTokenizer import JackTokenizer
+tokenizer = JackTokenizer(sys.argv[1])
+while tokenizer.hasMoreTokens():
+  tokenizer.advance()
+# Resolving the last position counts every line, which must not bring the whole file back either
+tokenizer.line
+tokenizer.close()
+with open('/proc/self/status') as status:
+  print(next(line.split()[1] for line in status if line.startswith('VmHWM:')))
+'''
+
+def write_lookup_table(path, entries, newline='\n'):
+  # Without newlines the comments have to be block comments
+  comment = '// entry' if newline == '\n' else '/* entry */'
+  with open(path, 'w') as jack_file:
+    jack_file.write(f'class Table {{{newline}  function void init(Array t) {{{newline}')
+    for i in range(entries):
+      jack_file.write(f'    let t[{i % 1000}] = {i % 32767}; {comment}{newline}')
+    jack_file.write(f'    return;{newline}  }}{newline}}}{newline}')
+
+def peak_rss(path):
+  result = subprocess.run(
+    [sys.executable, '-c', PEAK_RSS_SCRIPT, str(path)],
+    cwd=REPO_ROOT, capture_output=True, text=True, check=True
+  )
+  return int(result.stdout)
+
+def tokens_of(path):
+  tokenizer = JackTokenizer(str(path))
+  tokens = []
+  while tokenizer.hasMoreTokens():
+    tokenizer.advance()
+    tokens.append((tokenizer.current_token, tokenizer.line, tokenizer.column))
+  tokenizer.close()
+  return tokens
+
+def test_tokens_carry_positions_and_skip_comments(tmp_path):
+  source = tmp_path / 'Main.jack'
+  source.write_text('/** doc\n * comment */\nclass Main { // trailing\n  let s = "a b";\n}\n')
+
+  assert tokens_of(source) == [
+    ('class', 3, 1), ('Main', 3, 7), ('{', 3, 12),
+    ('let', 4, 3), ('s', 4, 7), ('=', 4, 9), ('"a b"', 4, 11), (';', 4, 16),
+    ('}', 5, 1)
+  ]
+
+def test_chunk_cuts_do_not_split_strings_or_comments(tmp_path, monkeypatch):
+  source = tmp_path / 'Main.jack'
+  source.write_text('let s = "a b c"; /* a b\n c */ x // d e "\n" é y\n')
+  expected = tokens_of(source)
+
+  # Every whitespace becomes a place where a chunk may be cut
+  monkeypatch.setattr(JackTokenizer, 'chunk_size', 1)
+  assert tokens_of(source) == expected == [
+    ('let', 1, 1), ('s', 1, 5), ('=', 1, 7), ('"a b c"', 1, 9), (';', 1, 16),
+    ('x', 2, 7), ('"', 3, 1), ('é', 3, 3), ('y', 3, 5)
+  ]
+
+def test_empty_file_has_no_tokens(tmp_path):
+  source = tmp_path / 'Empty.jack'
+  source.write_text('')
+
+  assert tokens_of(source) == []
+
+@pytest.mark.skipif(not Path('/proc/self/status').exists(), reason='needs /proc to read peak memory')
+@pytest.mark.parametrize('newline', ['\n', ' '])
+def test_peak_memory_does_not_grow_with_input_size(tmp_path, newline):
+  small = tmp_path / 'Small.jack'
+  large = tmp_path / 'Large.jack'
+  write_lookup_table(small, 50000, newline)    # ~1.6 MB
+  write_lookup_table(large, 600000, newline)   # ~19 MB
+
+  # Without releasing scanned pages the mapped file itself would show up in the peak
+  assert peak_rss(large) - peak_rss(small) < 4 * 1024
@@ -0,0 +1,88 @@
+import os
+
+from classes.SignatureIndex import SignatureIndex
+
+DEMO = '''/* class Fake { function int no() } */
+class Demo { // function void nope(int a) {
+  static String s; field int func, classy, mfunction;
+  constructor Demo new(int a, /* b, */ char c) { let s = "method int bad() {"; return this; }
+  method void m() { var int x; if (x) { do functional(); } return; }
+  function int f() { return 1; }
+}
+'''
+
+def test_only_class_level_declarations_are_indexed(tmp_path):
+  jack_file = tmp_path / 'Demo.jack'
+  jack_file.write_text(DEMO)
+
+  index = SignatureIndex([str(jack_file)])
+
+  assert index.hasClass('Demo') and not index.hasClass('Fake')
+  assert index.classes['Demo'] == {
+    'new': {'kind': 'constructor', 'parameter_count': 2, 'return_type': 'Demo'},
+    'm': {'kind': 'method', 'parameter_count': 0, 'return_type': 'void'},
+    'f': {'kind': 'function', 'parameter_count': 0, 'return_type': 'int'},
+  }
+
+def test_cache_is_reused_until_the_file_changes(tmp_path):
+  jack_file = tmp_path / 'Demo.jack'
+  jack_file.write_text(DEMO)
+  cache_file = tmp_path / SignatureIndex.cache_file_name
+
+  SignatureIndex([str(jack_file)], str(tmp_path))
+  cached = cache_file.read_text()
+
+  # An unchanged project leaves the cache file untouched
+  os.utime(cache_file, ns=(0, 0))
+  SignatureIndex([str(jack_file)], str(tmp_path))
+  assert cache_file.stat().st_mtime_ns == 0
+
+  jack_file.write_text(DEMO.replace('method void m()', 'method void m(int y)'))
+  index = SignatureIndex([str(jack_file)], str(tmp_path))
+  assert index.signatureOf('Demo', 'm')['parameter_count'] == 1
+  assert cache_file.read_text() != cached
+
+def test_unreadable_files_are_left_out(tmp_path):
+  jack_file = tmp_path / 'Demo.jack'
+  jack_file.write_text(DEMO)
+  (tmp_path / 'Gone.jack').symlink_to(tmp_path / 'missing')
+  (tmp_path / 'Dir.jack').mkdir()
+
+  index = SignatureIndex([str(tmp_path / name) for name in ['Dir.jack', 'Demo.jack', 'Gone.jack']], str(tmp_path))
+
+  assert list(index.classes) == ['Demo']
+
+def test_nothing_is_written_without_a_cache_dir(tmp_path):
+  jack_file = tmp_path / 'Demo.jack'
+  jack_file.write_text(DEMO)
+
+  SignatureIndex([str(jack_file)])
+
+  assert not (tmp_path / SignatureIndex.cache_file_name).exists()
+
+def test_comments_are_allowed_inside_headers(tmp_path):
+  jack_file = tmp_path / 'Main.jack'
+  jack_file.write_text('''class /* name */ Main {
+  function /** returns */ int a(int x) { return x; }
+  method // kind
+    void b /* ) */ (int x /* ) */, // int y)
+    int z) { return; }
+}
+''')
+
+  index = SignatureIndex([str(jack_file)])
+
+  assert index.hasAllSignatures('Main')
+  assert index.classes['Main'] == {
+    'a': {'kind': 'function', 'parameter_count': 1, 'return_type': 'int'},
+    'b': {'kind': 'method', 'parameter_count': 2, 'return_type': 'void'},
+  }
+
+def test_unreadable_header_leaves_the_class_incomplete(tmp_path):
+  jack_file = tmp_path / 'Main.jack'
+  jack_file.write_text('class Main {\n  function int f(int x { return x; }\n  function void g() { return; }\n}\n')
+
+  index = SignatureIndex([str(jack_file)])
+
+  assert index.hasClass('Main') and not index.hasAllSignatures('Main')
+  assert list(index.classes['Main']) == ['g']
@@ -0,0 +1,67 @@
+from classes.VMLinker import VMLinker
+
+def link(tmp_path, classes):
+  '''Links the given {class name: vm code} in order and returns the bundle as a list of commands'''
+  linker = VMLinker()
+  for class_name, vm_code in classes.items():
+    class_file = tmp_path / f'{class_name}.vm'
+    class_file.write_text(vm_code)
+    linker.addClass(str(class_file))
+
+  bundle = tmp_path / 'bundle.vm'
+  linker.link(str(bundle))
+  return bundle.read_text().splitlines()
+
+def functions_of(commands):
+  return [command.split()[1] for command in commands if command.startswith('function ')]
+
+def test_statics_are_relocated_per_class(tmp_path):
+  commands = link(tmp_path, {
+    'A': 'function A.set 0\npush constant 1\npop static 0\npush static 1\nreturn\n',
+    'B': 'function B.set 0\npush constant 2\npop static 0\nreturn\n',
+  })
+
+  assert commands == [
+    'function A.set 0', 'push constant 1', 'pop static 0', 'push static 1', 'return',
+    'function B.set 0', 'push constant 2', 'pop static 2', 'return',
+  ]
+
+def test_identical_functions_are_emitted_once_and_calls_redirected(tmp_path):
+  commands = link(tmp_path, {
+    'Main': 'function Main.main 0\ncall A.one 0\ncall B.one 0\nadd\nreturn\n',
+    'A': 'function A.one 0\npush constant 1\nreturn\n',
+    'B': 'function B.one 0\npush constant 1\nreturn\n',
+  })
+
+  assert functions_of(commands) == ['Main.main', 'A.one']
+  assert commands.count('call A.one 0') == 2
+  assert 'call B.one 0' not in commands
+
+def test_functions_touching_different_statics_are_not_merged(tmp_path):
+  commands = link(tmp_path, {
+    'A': 'function A.get 0\npush static 0\nreturn\n',
+    'B': 'function B.get 0\npush static 0\nreturn\n',
+  })
+
+  assert functions_of(commands) == ['A.get', 'B.get']
+  assert 'push static 0' in commands and 'push static 1' in commands
+
+def test_entry_point_is_never_merged_away(tmp_path):
+  commands = link(tmp_path, {
+    'A': 'function A.start 0\npush constant 0\nreturn\n',
+    'Sys': 'function Sys.init 0\npush constant 0\nreturn\n',
+  })
+
+  assert functions_of(commands) == ['Sys.init', 'A.start']
+
+def test_functions_are_laid_out_from_the_entry_point(tmp_path):
+  commands = link(tmp_path, {
+    'Lib': 'function Lib.unused 0\npush constant 9\nreturn\n'
+           'function Lib.rare 0\npush constant 2\nreturn\n'
+           'function Lib.hot 0\ncall Lib.leaf 0\nreturn\n'
+           'function Lib.leaf 0\npush constant 3\nreturn\n',
+    'Main': 'function Main.main 0\ncall Lib.rare 0\ncall Lib.hot 0\ncall Lib.hot 0\nreturn\n',
+  })
+
+  # The most called callee first, each followed by its own callees, unreached functions last
+  assert functions_of(commands) == ['Main.main', 'Lib.hot', 'Lib.leaf', 'Lib.rare', 'Lib.unused']